@@ -3,26 +3,114 @@ FastAPI application for Invoice QC Service.
 Provides HTTP API endpoints for validation and extraction.
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
 from typing import List
+import asyncio
+import multiprocessing
+import os
+import orjson
 import tempfile
-import shutil
+import threading
 from pathlib import Path
 import sys
 
-# Add parent directory to path to import invoice_qc
-sys.path.append(str(Path(__file__).parent.parent))
+from pydantic import ValidationError as PydanticValidationError
 
-from invoice_qc.schemas import Invoice, ValidationReport
+from invoice_qc.schemas import INVOICE_LIST_ADAPTER, Invoice, ValidationReport
 from invoice_qc.validator import InvoiceValidator
 from invoice_qc.extractor import InvoiceExtractor
+from invoice_qc.cache import ExtractionCache, HashingWriter
+
+
+# Split the CPUs between server workers so total extraction processes stay
+# near cpu_count; INVOICE_QC_EXTRACT_WORKERS overrides the per-worker share
+EXTRACT_PROCESSES = int(
+    os.getenv("INVOICE_QC_EXTRACT_WORKERS")
+    or max(1, (os.cpu_count() or 1) // int(os.getenv("WEB_CONCURRENCY") or 1))
+)
+_POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+_process_pool_lock = threading.Lock()
+
+
+def _new_process_pool() -> ProcessPoolExecutor:
+    """
+    Create the shared extraction process pool.
+    
+    Uses forkserver/spawn because forking this multi-threaded process can deadlock.
+    """
+    return ProcessPoolExecutor(
+        max_workers=EXTRACT_PROCESSES,
+        mp_context=multiprocessing.get_context(_POOL_START_METHOD)
+    )
+
+
+def _extract_directory(app: FastAPI, pdf_dir: Path) -> List[Invoice]:
+    """
+    Extract a directory of PDFs on the shared process pool.
+    
+    A worker that dies (OOM, crash inside the PDF parser) marks the whole
+    pool as broken, so the pool is replaced and the extraction retried once
+    instead of failing every later request until a restart.
+    """
+    pool = app.state.process_pool
+    try:
+        return app.state.extractor.extract_from_directory_parallel(
+            pdf_dir, workers=EXTRACT_PROCESSES, executor=pool
+        )
+    except BrokenProcessPool:
+        with _process_pool_lock:
+            # Another request may already have replaced it
+            if app.state.process_pool is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                app.state.process_pool = _new_process_pool()
+            pool = app.state.process_pool
+        return app.state.extractor.extract_from_directory_parallel(
+            pdf_dir, workers=EXTRACT_PROCESSES, executor=pool
+        )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build services and warm their caches before the app accepts requests.
+    
+    The first request would otherwise pay for regex compilation and
+    pydantic schema set-up inline.
+    """
+    app.state.validator = InvoiceValidator()
+    app.state.extractor = InvoiceExtractor()
+    # PDF parsing is blocking; run it off the event loop so other requests keep flowing.
+    # extract_from_directory_parallel fans the files out to worker processes from here.
+    app.state.extraction_pool = ThreadPoolExecutor(max_workers=os.cpu_count())
+    # One process pool shared by every request (replaced only if it breaks)
+    app.state.process_pool = _new_process_pool()
+    # Extractions hold invoice contents (names, addresses, tax IDs), so they
+    # are only kept on disk when a cache directory is configured
+    cache_dir = os.getenv("INVOICE_QC_CACHE_DIR")
+    app.state.extraction_cache = ExtractionCache(Path(cache_dir)) if cache_dir else None
+    
+    app.state.extractor.warm_up()
+    INVOICE_LIST_ADAPTER.validate_python([])
+    
+    yield
+    
+    app.state.extraction_pool.shutdown(wait=False)
+    app.state.process_pool.shutdown(wait=False, cancel_futures=True)
+
 
 # Create FastAPI app
 app = FastAPI(
     title="Invoice QC Service API",
     description="API for extracting and validating invoice data",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Add CORS middleware for frontend integration
@@ -34,23 +122,152 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-validator = InvoiceValidator()
-extractor = InvoiceExtractor()
+MAX_PDF_BYTES = 50 * 1024 * 1024
+
+# Staging directory for uploaded PDFs; defaults to the system temp directory.
+# Pointing it at tmpfs (e.g. /dev/shm) is opt-in, since container shm is often
+# only 64 MB and a few large concurrent uploads would run it out of space.
+UPLOAD_TMP_DIR = os.getenv("INVOICE_QC_UPLOAD_DIR") or None
+
+
+def _too_large(filename: str) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File {filename} is too large (limit {MAX_PDF_BYTES // (1024 * 1024)} MB)"
+    )
+
+
+def _save_upload(src, dst_path: Path, filename: str) -> str:
+    """
+    Copy an upload to dst_path and return the SHA-256 of its bytes.
+    
+    Bytes are counted while copying, so uploads without a declared size
+    (chunked transfer) are still held to MAX_PDF_BYTES.
+    """
+    written = 0
+    with open(dst_path, 'wb') as out:
+        writer = HashingWriter(out)
+        while chunk := src.read(1 << 20):
+            written += len(chunk)
+            if written > MAX_PDF_BYTES:
+                raise _too_large(filename)
+            writer.write(chunk)
+    return writer.hexdigest()
+
+
+def _check_upload(file: UploadFile) -> str:
+    """
+    Reject non-PDF or oversized uploads before anything touches disk.
+
+    Returns the sanitized filename (directory components stripped) so an
+    upload cannot be written outside the temporary directory.
+    """
+    filename = os.path.basename(file.filename or "")
+    if not filename.lower().endswith('.pdf'):
+        raise HTTPException(
+            status_code=400,
+            detail=f"File {file.filename} is not a PDF"
+        )
+    # Checked again while saving, since size is unknown for chunked uploads
+    if file.size is not None and file.size > MAX_PDF_BYTES:
+        raise _too_large(filename)
+    return filename
+
+
+async def _receive_upload(file: UploadFile, dst_path: Path, filename: str) -> str:
+    """Save an upload without blocking the event loop"""
+    return await run_in_threadpool(_save_upload, file.file, dst_path, filename)
+
+
+# Static responses are serialized once at import instead of on every request
+_ROOT_INFO = {
+    "name": "Invoice QC Service API",
+    "version": "1.0.0",
+    "endpoints": {
+        "health": "/health",
+        "validate": "/validate-json",
+        "validate_fast": "/validate-json-fast",
+        "extract_and_validate": "/extract-and-validate-pdfs"
+    }
+}
+_ROOT_INFO_BYTES = orjson.dumps(_ROOT_INFO)
+
+_HEALTH = {
+    "status": "ok",
+    "service": "invoice-qc-service",
+    "version": "1.0.0"
+}
+_HEALTH_BYTES = orjson.dumps(_HEALTH)
+
+_API_INFO = {
+    "validation_rules": {
+        "completeness": [
+            {
+                "rule": "invoice_number_required",
+                "description": "Invoice must have a non-empty invoice number"
+            },
+            {
+                "rule": "invoice_date_required",
+                "description": "Invoice must have an invoice date"
+            },
+            {
+                "rule": "parties_required",
+                "description": "Seller and buyer names must not be empty"
+            },
+            {
+                "rule": "amounts_required",
+                "description": "Key financial amounts must be present"
+            }
+        ],
+        "business_rules": [
+            {
+                "rule": "date_order",
+                "description": "Due date must be on or after invoice date"
+            },
+            {
+                "rule": "totals_consistency",
+                "description": "Net total + tax amount should equal gross total"
+            },
+            {
+                "rule": "line_items_sum",
+                "description": "Sum of line item totals should match net total"
+            },
+            {
+                "rule": "non_negative_amounts",
+                "description": "All amounts must be non-negative"
+            }
+        ],
+        "anomaly_rules": [
+            {
+                "rule": "duplicate_invoice",
+                "description": "No duplicate invoices (same invoice number + seller)"
+            },
+            {
+                "rule": "reasonable_date_range",
+                "description": "Dates should be within reasonable range"
+            },
+            {
+                "rule": "valid_currency",
+                "description": "Currency must be from known set (EUR, USD, INR, GBP)"
+            }
+        ]
+    },
+    "schema_fields": {
+        "identifiers": ["invoice_number", "external_reference"],
+        "seller": ["seller_name", "seller_address", "seller_tax_id"],
+        "buyer": ["buyer_name", "buyer_address", "buyer_tax_id"],
+        "dates": ["invoice_date", "due_date"],
+        "financial": ["currency", "net_total", "tax_amount", "tax_rate", "gross_total"],
+        "additional": ["payment_terms", "line_items"]
+    }
+}
+_API_INFO_BYTES = orjson.dumps(_API_INFO)
 
 
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
-    return {
-        "name": "Invoice QC Service API",
-        "version": "1.0.0",
-        "endpoints": {
-            "health": "/health",
-            "validate": "/validate-json",
-            "extract_and_validate": "/extract-and-validate-pdfs"
-        }
-    }
+    return Response(content=_ROOT_INFO_BYTES, media_type="application/json")
 
 
 @app.get("/health")
@@ -58,18 +275,17 @@ async def health_check():
     """
     Health check endpoint.
     
+    The lifespan builds and warms every service before the app accepts
+    requests, so a worker that answers here is ready.
+    
     Returns:
         Status information about the service
     """
-    return {
-        "status": "ok",
-        "service": "invoice-qc-service",
-        "version": "1.0.0"
-    }
+    return Response(content=_HEALTH_BYTES, media_type="application/json")
 
 
 @app.post("/validate-json", response_model=ValidationReport)
-async def validate_invoices(invoices: List[Invoice]):
+async def validate_invoices(invoices: List[Invoice], request: Request):
     """
     Validate a list of invoices provided as JSON.
     
@@ -91,7 +307,7 @@ async def validate_invoices(invoices: List[Invoice]):
             raise HTTPException(status_code=400, detail="No invoices provided")
         
         # Validate invoices
-        report = validator.validate_batch(invoices)
+        report = request.app.state.validator.validate_batch(invoices)
         
         return report
     
@@ -99,8 +315,39 @@ async def validate_invoices(invoices: List[Invoice]):
         raise HTTPException(status_code=500, detail=f"Validation error: {str(e)}")
 
 
+@app.post("/validate-json-fast", response_model=ValidationReport)
+async def validate_invoices_fast(request: Request):
+    """
+    Validate a list of invoices provided as raw JSON.
+    
+    Same contract as /validate-json, but the request body is parsed and
+    validated in one pass by the precompiled invoice-list adapter instead
+    of going through FastAPI's body decoding and per-field coercion.
+    Intended for large batches from internal clients.
+    
+    Example:
+        ```bash
+        curl -X POST http://localhost:8000/validate-json-fast \\
+          -H "Content-Type: application/json" \\
+          --data-binary @extracted.json
+        ```
+    """
+    try:
+        invoices = INVOICE_LIST_ADAPTER.validate_json(await request.body())
+    except PydanticValidationError as e:
+        # Leave out "input": for malformed JSON it is the raw request bytes,
+        # which the error response cannot serialize
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_input=False))
+    
+    if not invoices:
+        raise HTTPException(status_code=400, detail="No invoices provided")
+    
+    report = request.app.state.validator.validate_batch(invoices)
+    return Response(content=report.model_dump_json(), media_type="application/json")
+
+
 @app.post("/extract-and-validate-pdfs")
-async def extract_and_validate_pdfs(files: List[UploadFile] = File(...)):
+async def extract_and_validate_pdfs(request: Request, files: List[UploadFile] = File(...)):
     """
     Extract data from uploaded PDFs and validate them.
     
@@ -121,28 +368,65 @@ async def extract_and_validate_pdfs(files: List[UploadFile] = File(...)):
         if not files:
             raise HTTPException(status_code=400, detail="No files provided")
         
-        # Check all files are PDFs
-        for file in files:
-            if not file.filename.lower().endswith('.pdf'):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"File {file.filename} is not a PDF"
-                )
+        # Reject bad batches before creating any files
+        filenames = [_check_upload(file) for file in files]
         
         # Create temporary directory for PDFs
-        with tempfile.TemporaryDirectory() as temp_dir:
+        with tempfile.TemporaryDirectory(dir=UPLOAD_TMP_DIR) as temp_dir:
             temp_path = Path(temp_dir)
             
-            # Save uploaded files
-            saved_files = []
-            for file in files:
-                file_path = temp_path / file.filename
-                with open(file_path, 'wb') as f:
-                    shutil.copyfileobj(file.file, f)
-                saved_files.append(file_path)
+            # Save uploaded files concurrently, hashing them on the way to disk.
+            # Each upload gets a positional name so equal client filenames cannot collide.
+            # Every save is awaited before any error is raised, so none is
+            # still writing while the temporary directory is removed.
+            results = await asyncio.gather(*(
+                _receive_upload(file, temp_path / f"{index}.pdf", filename)
+                for index, (file, filename) in enumerate(zip(files, filenames))
+            ), return_exceptions=True)
+            errors = [result for result in results if isinstance(result, BaseException)]
+            if errors:
+                raise next((e for e in errors if isinstance(e, HTTPException)), errors[0])
+            hashes = results
             
-            # Extract invoices
-            invoices = extractor.extract_from_directory(temp_path)
+            # Identical uploads collapse to one file, and files already in the
+            # extraction cache are not parsed at all.
+            cache = request.app.state.extraction_cache
+            unique_files = {}
+            extracted = {}
+            for index, sha in enumerate(hashes):
+                upload_path = temp_path / f"{index}.pdf"
+                if sha in unique_files:
+                    upload_path.unlink()
+                    continue
+                unique_files[sha] = upload_path.name
+                
+                if cache is not None:
+                    cached = await run_in_threadpool(cache.get, sha)
+                    if cached is not None:
+                        extracted[sha] = Invoice.model_validate(cached)
+                        upload_path.unlink()
+            
+            # Extract invoices that missed the cache
+            if len(extracted) < len(unique_files):
+                file_hashes = {name: sha for sha, name in unique_files.items()}
+                new_invoices = await asyncio.get_running_loop().run_in_executor(
+                    request.app.state.extraction_pool,
+                    _extract_directory,
+                    request.app,
+                    temp_path
+                )
+                for invoice in new_invoices:
+                    sha = file_hashes[invoice.source_file]
+                    extracted[sha] = invoice
+                    if cache is not None:
+                        await run_in_threadpool(cache.put, sha, invoice.model_dump(mode='json'))
+            
+            # Re-expand to one invoice per upload, in client order
+            invoices = [
+                extracted[sha].model_copy(update={"source_file": filename})
+                for filename, sha in zip(filenames, hashes)
+                if sha in extracted
+            ]
             
             if not invoices:
                 return {
@@ -152,14 +436,25 @@ async def extract_and_validate_pdfs(files: List[UploadFile] = File(...)):
                 }
             
             # Validate invoices
-            report = validator.validate_batch(invoices)
+            report = request.app.state.validator.validate_batch(invoices)
             
-            return {
-                "extracted_invoices": [invoice.model_dump(mode='json') for invoice in invoices],
-                "validation_report": report.model_dump(mode='json'),
+            # Serialize each model straight to JSON once instead of building
+            # intermediate dicts for the response encoder to walk again
+            counts = orjson.dumps({
                 "files_processed": len(files),
-                "invoices_extracted": len(invoices)
-            }
+                "invoices_extracted": len(invoices),
+                "unique_pdfs": len(unique_files),
+                "duplicate_uploads": len(files) - len(unique_files)
+            })
+            body = b"".join((
+                b'{"extracted_invoices":[',
+                b",".join(invoice.model_dump_json().encode() for invoice in invoices),
+                b'],"validation_report":',
+                report.model_dump_json().encode(),
+                b",",
+                counts[1:],
+            ))
+            return Response(content=body, media_type="application/json")
     
     except HTTPException:
         raise
@@ -173,70 +468,21 @@ async def extract_and_validate_pdfs(files: List[UploadFile] = File(...)):
 @app.get("/api/info")
 async def api_info():
     """Get information about available validation rules"""
-    return {
-        "validation_rules": {
-            "completeness": [
-                {
-                    "rule": "invoice_number_required",
-                    "description": "Invoice must have a non-empty invoice number"
-                },
-                {
-                    "rule": "invoice_date_required",
-                    "description": "Invoice must have an invoice date"
-                },
-                {
-                    "rule": "parties_required",
-                    "description": "Seller and buyer names must not be empty"
-                },
-                {
-                    "rule": "amounts_required",
-                    "description": "Key financial amounts must be present"
-                }
-            ],
-            "business_rules": [
-                {
-                    "rule": "date_order",
-                    "description": "Due date must be on or after invoice date"
-                },
-                {
-                    "rule": "totals_consistency",
-                    "description": "Net total + tax amount should equal gross total"
-                },
-                {
-                    "rule": "line_items_sum",
-                    "description": "Sum of line item totals should match net total"
-                },
-                {
-                    "rule": "non_negative_amounts",
-                    "description": "All amounts must be non-negative"
-                }
-            ],
-            "anomaly_rules": [
-                {
-                    "rule": "duplicate_invoice",
-                    "description": "No duplicate invoices (same invoice number + seller)"
-                },
-                {
-                    "rule": "reasonable_date_range",
-                    "description": "Dates should be within reasonable range"
-                },
-                {
-                    "rule": "valid_currency",
-                    "description": "Currency must be from known set (EUR, USD, INR, GBP)"
-                }
-            ]
-        },
-        "schema_fields": {
-            "identifiers": ["invoice_number", "external_reference"],
-            "seller": ["seller_name", "seller_address", "seller_tax_id"],
-            "buyer": ["buyer_name", "buyer_address", "buyer_tax_id"],
-            "dates": ["invoice_date", "due_date"],
-            "financial": ["currency", "net_total", "tax_amount", "tax_rate", "gross_total"],
-            "additional": ["payment_terms", "line_items"]
-        }
-    }
+    return Response(content=_API_INFO_BYTES, media_type="application/json")
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    web_concurrency = int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1)
+    # Server workers re-import this module; tell them how many siblings share the CPUs
+    os.environ["WEB_CONCURRENCY"] = str(web_concurrency)
+    # Multiple workers require the import string form rather than the app object
+    uvicorn.run(
+        "api.main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="auto" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        workers=web_concurrency,
+        log_level="warning"
+    )
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""
+Content-addressable cache for extracted invoices.
+Extraction results are keyed by the SHA-256 of the PDF bytes, so
+byte-identical uploads skip PDF parsing entirely. Entries also live under
+a version directory derived from the extractor and schema source, so a
+changed extractor never serves results from an older one.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional, Dict, Any, BinaryIO
+
+
+def _source_version() -> str:
+    """Short digest of the modules whose code determines extraction output"""
+    h = hashlib.sha256()
+    package_dir = Path(__file__).parent
+    for name in ("extractor.py", "schemas.py"):
+        try:
+            h.update((package_dir / name).read_bytes())
+        except OSError:
+            h.update(name.encode())
+    return h.hexdigest()[:12]
+
+
+EXTRACTION_VERSION = _source_version()
+
+
+class HashingWriter:
+    """File-like wrapper that hashes bytes while writing them through"""
+
+    def __init__(self, fileobj: BinaryIO):
+        self._fileobj = fileobj
+        self._hash = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        self._hash.update(data)
+        return self._fileobj.write(data)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+class ExtractionCache:
+    """
+    On-disk cache of extracted invoice JSON.
+
+    Entries are stored as {cache_dir}/{version}/{sha[:2]}/{sha}.json so a
+    single directory never grows too large and entries written by another
+    extractor version are never read.
+    """
+
+    def __init__(self, cache_dir: Path, version: str = EXTRACTION_VERSION):
+        self.cache_dir = Path(cache_dir)
+        self.entry_dir = self.cache_dir / version
+
+    @staticmethod
+    def hash_file(path: Path, chunk_size: int = 1 << 20) -> str:
+        """Compute the cache key (SHA-256 hex digest) of a file"""
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _path(self, sha: str) -> Path:
+        return self.entry_dir / sha[:2] / f"{sha}.json"
+
+    def get(self, sha: str) -> Optional[Dict[str, Any]]:
+        """Return the cached invoice JSON for a digest, or None on miss"""
+        path = self._path(sha)
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def put(self, sha: str, data: Dict[str, Any]) -> None:
+        """
+        Store invoice JSON (as produced by model_dump(mode="json")).
+
+        Best-effort: a failed write leaves the cache without the entry
+        rather than failing the extraction that produced it.
+        """
+        path = self._path(sha)
+        tmp_path = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a uniquely named temp file first, so concurrent writers
+            # (threads share a PID) never collide and readers never see
+            # partial JSON
+            with tempfile.NamedTemporaryFile(
+                "w", dir=path.parent, prefix=f"{sha}.", suffix=".tmp", delete=False
+            ) as f:
+                tmp_path = Path(f.name)
+                f.write(json.dumps(data))
+            os.replace(tmp_path, path)
+        except OSError:
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
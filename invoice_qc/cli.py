@@ -3,26 +3,39 @@ Command-line interface for Invoice QC Service.
 Provides extract, validate, and full-run commands.
 """
 
-import json
+import hashlib
+import orjson
+from heapq import nlargest
+from operator import itemgetter
 from pathlib import Path
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 import typer
 from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
 
-from .extractor import InvoiceExtractor
-from .validator import InvoiceValidator
-from .schemas import Invoice, ValidationReport
+# Extraction, validation and table rendering pull in pdfplumber/pdfminer,
+# pydantic models and rich layout code. They are imported inside the
+# commands that need them so `--help` and shell completion stay fast.
+if TYPE_CHECKING:
+    from .schemas import ValidationReport, ValidationSummary
 
 app = typer.Typer(help="Invoice Quality Control CLI")
 console = Console()
 
+# Bump the version whenever the validation summary layout changes
+_RENDER_CACHE_VERSION = "1"
+# Rendered summaries kept per --cache-dir; the oldest are evicted beyond this
+_RENDER_CACHE_MAX_ENTRIES = 64
+
+_DEFAULT_EXTRACTED = Path("extracted_invoices.json")
+_DEFAULT_REPORT = Path("validation_report.json")
+
 
 @app.command()
 def extract(
     pdf_dir: Path = typer.Option(..., "--pdf-dir", help="Directory containing PDF invoices"),
-    output: Path = typer.Option("extracted_invoices.json", "--output", help="Output JSON file"),
+    output: Path = typer.Option(_DEFAULT_EXTRACTED, "--output", help="Output JSON file"),
+    cache_dir: Optional[Path] = typer.Option(None, "--cache-dir", help="Reuse extractions of identical PDFs from this directory"),
+    workers: Optional[int] = typer.Option(None, "--workers", help="Number of extraction processes (default: CPU count)"),
 ):
     """
     Extract structured data from invoice PDFs.
@@ -30,6 +43,10 @@ def extract(
     Example:
         python -m invoice_qc extract --pdf-dir pdfs --output invoices.json
     """
+    from .cache import ExtractionCache
+    from .extractor import InvoiceExtractor
+    from .schemas import INVOICE_LIST_ADAPTER
+
     console.print(f"\n[bold blue]📄 Extracting invoices from:[/bold blue] {pdf_dir}")
 
     if not pdf_dir.exists():
@@ -37,18 +54,15 @@ def extract(
         raise typer.Exit(code=1)
 
     extractor = InvoiceExtractor()
-    invoices = extractor.extract_from_directory(pdf_dir)
+    cache = ExtractionCache(cache_dir) if cache_dir else None
+    invoices = extractor.extract_from_directory_parallel(pdf_dir, workers=workers, cache=cache)
 
     if not invoices:
         console.print("[yellow]⚠️  No invoices extracted[/yellow]")
         raise typer.Exit(code=0)
 
-    output.parent.mkdir(parents=True, exist_ok=True)
-    output.write_text(json.dumps(
-        [invoice.model_dump(mode="json") for invoice in invoices],
-        indent=2,
-        default=str
-    ))
+    _ensure_parent(output)
+    output.write_bytes(INVOICE_LIST_ADAPTER.dump_json(invoices, indent=2))
 
     console.print(f"\n[bold green]✓ Extracted {len(invoices)} invoices[/bold green]")
     console.print(f"[dim]Output saved to:[/dim] {output}")
@@ -59,8 +73,11 @@ def extract(
 @app.command()
 def validate(
     input_file: Path = typer.Option(..., "--input", help="Input JSON file with extracted invoices"),
-    report: Path = typer.Option("validation_report.json", "--report", help="Output validation report file"),
+    report: Path = typer.Option(_DEFAULT_REPORT, "--report", help="Output validation report file"),
     tolerance: float = typer.Option(0.02, "--tolerance", help="Amount matching tolerance (default: 2%)"),
+    jsonl: bool = typer.Option(False, "--jsonl", help="Stream the report as JSON lines (summary header, then one line per invoice)"),
+    top: int = typer.Option(20, "--top", help="Number of error/warning types to display"),
+    cache_dir: Optional[Path] = typer.Option(None, "--cache-dir", help="Reuse rendered summaries from this directory"),
 ):
     """
     Validate extracted invoice data.
@@ -68,22 +85,31 @@ def validate(
     Example:
         python -m invoice_qc validate --input invoices.json --report report.json
     """
+    from pydantic import ValidationError
+    from .schemas import INVOICE_LIST_ADAPTER
+    from .validator import InvoiceValidator
+
     console.print(f"\n[bold blue]🔍 Validating invoices from:[/bold blue] {input_file}")
 
     if not input_file.exists():
         console.print(f"[bold red]❌ Error:[/bold red] File {input_file} does not exist")
         raise typer.Exit(code=1)
 
-    invoices_data = json.loads(input_file.read_text())
-    invoices = [Invoice(**data) for data in invoices_data]
+    try:
+        invoices = INVOICE_LIST_ADAPTER.validate_json(input_file.read_bytes())
+    except ValidationError as e:
+        console.print(f"[bold red]❌ Error:[/bold red] {input_file} is not a valid invoice list")
+        # The error text quotes the input, which may contain [..] that Rich
+        # would otherwise read as markup
+        console.print(str(e), style="dim", markup=False)
+        raise typer.Exit(code=1)
 
     validator = InvoiceValidator(tolerance=tolerance)
     validation_report = validator.validate_batch(invoices)
 
-    report.parent.mkdir(parents=True, exist_ok=True)
-    report.write_text(validation_report.model_dump_json(indent=2))
+    _write_report(report, validation_report, jsonl)
 
-    _print_validation_results(validation_report)
+    _print_validation_results(validation_report, top=top, cache_dir=cache_dir)
     console.print(f"\n[dim]Report saved to:[/dim] {report}")
 
     if validation_report.summary.invalid_invoices > 0:
@@ -93,9 +119,13 @@ def validate(
 @app.command("full-run")
 def full_run(
     pdf_dir: Path = typer.Option(..., "--pdf-dir", help="Directory containing PDF invoices"),
-    report: Path = typer.Option("validation_report.json", "--report", help="Output validation report file"),
+    report: Path = typer.Option(_DEFAULT_REPORT, "--report", help="Output validation report file"),
     save_extracted: Optional[Path] = typer.Option(None, "--save-extracted", help="Also save extracted JSON"),
     tolerance: float = typer.Option(0.02, "--tolerance", help="Amount matching tolerance"),
+    jsonl: bool = typer.Option(False, "--jsonl", help="Stream the report as JSON lines (summary header, then one line per invoice)"),
+    top: int = typer.Option(20, "--top", help="Number of error/warning types to display"),
+    cache_dir: Optional[Path] = typer.Option(None, "--cache-dir", help="Reuse extractions of identical PDFs and rendered summaries from this directory"),
+    workers: Optional[int] = typer.Option(None, "--workers", help="Number of extraction processes (default: CPU count)"),
 ):
     """
     Extract and validate invoices in one command (end-to-end).
@@ -103,6 +133,11 @@ def full_run(
     Example:
         python -m invoice_qc full-run --pdf-dir pdfs --report report.json
     """
+    from .cache import ExtractionCache
+    from .extractor import InvoiceExtractor
+    from .schemas import INVOICE_LIST_ADAPTER
+    from .validator import InvoiceValidator
+
     console.print(f"\n[bold blue]🚀 Running full invoice QC pipeline[/bold blue]")
     console.print(f"[dim]PDF directory:[/dim] {pdf_dir}")
 
@@ -113,7 +148,8 @@ def full_run(
     # Step 1: Extract
     console.print("\n[bold]Step 1: Extraction[/bold]")
     extractor = InvoiceExtractor()
-    invoices = extractor.extract_from_directory(pdf_dir)
+    cache = ExtractionCache(cache_dir) if cache_dir else None
+    invoices = extractor.extract_from_directory_parallel(pdf_dir, workers=workers, cache=cache)
 
     if not invoices:
         console.print("[yellow]⚠️  No invoices extracted[/yellow]")
@@ -123,12 +159,8 @@ def full_run(
 
     # Optionally save extracted data
     if save_extracted:
-        save_extracted.parent.mkdir(parents=True, exist_ok=True)
-        save_extracted.write_text(json.dumps(
-            [invoice.model_dump(mode="json") for invoice in invoices],
-            indent=2,
-            default=str
-        ))
+        _ensure_parent(save_extracted)
+        save_extracted.write_bytes(INVOICE_LIST_ADAPTER.dump_json(invoices, indent=2))
         console.print(f"[dim]Extracted data saved to:[/dim] {save_extracted}")
 
     # Step 2: Validate
@@ -136,18 +168,60 @@ def full_run(
     validator = InvoiceValidator(tolerance=tolerance)
     validation_report = validator.validate_batch(invoices)
 
-    report.parent.mkdir(parents=True, exist_ok=True)
-    report.write_text(validation_report.model_dump_json(indent=2))
+    _write_report(report, validation_report, jsonl)
 
-    _print_validation_results(validation_report)
+    _print_validation_results(validation_report, top=top, cache_dir=cache_dir)
     console.print(f"\n[dim]Report saved to:[/dim] {report}")
 
     if validation_report.summary.invalid_invoices > 0:
         raise typer.Exit(code=1)
 
 
+def _ensure_parent(path: Path):
+    """Create the parent directory of an output file if it is missing"""
+    parent = path.parent
+    if parent != Path(".") and not parent.exists():
+        parent.mkdir(parents=True, exist_ok=True)
+
+
+def _write_report(path: Path, report: "ValidationReport", jsonl: bool):
+    """
+    Write a validation report to disk.
+
+    By default a single indented JSON document is written. With jsonl=True
+    the report is streamed as JSON lines instead: a header line with the
+    summary, then one line per invoice result, so the full report string is
+    never built in memory.
+    """
+    from .schemas import REPORT_ADAPTER
+
+    _ensure_parent(path)
+    if not jsonl:
+        path.write_bytes(REPORT_ADAPTER.dump_json(report, indent=2))
+        return
+
+    with path.open("wb") as f:
+        f.write(orjson.dumps({
+            "generated_at": report.generated_at.isoformat(),
+            "summary": report.summary.model_dump(mode="json"),
+        }))
+        f.write(b"\n")
+        for line in report.iter_results_json():
+            f.write(line)
+            f.write(b"\n")
+
+
+def _truncate(value: Optional[str], width: int = 30) -> str:
+    """Shorten a table cell to width characters, or N/A when empty"""
+    if not value:
+        return "N/A"
+    return value[:width] + "..." if len(value) > width else value
+
+
 def _print_extraction_summary(invoices):
     """Pretty-print a summary table of extracted invoices"""
+    from rich.table import Table
+
     table = Table(title="Extracted Invoices", show_header=True, header_style="bold cyan")
 
     table.add_column("Invoice #", style="cyan")
@@ -157,15 +231,19 @@ def _print_extraction_summary(invoices):
     table.add_column("Amount", justify="right")
     table.add_column("Currency")
 
-    for invoice in invoices[:10]:
-        table.add_row(
+    rows = [
+        (
             invoice.invoice_number or "N/A",
             str(invoice.invoice_date) if invoice.invoice_date else "N/A",
-            (invoice.seller_name[:30] + "...") if invoice.seller_name and len(invoice.seller_name) > 30 else (invoice.seller_name or "N/A"),
-            (invoice.buyer_name[:30] + "...") if invoice.buyer_name and len(invoice.buyer_name) > 30 else (invoice.buyer_name or "N/A"),
-            str(invoice.gross_total) if invoice.gross_total else "N/A",
-            invoice.currency or "N/A"
+            _truncate(invoice.seller_name),
+            _truncate(invoice.buyer_name),
+            "N/A" if invoice.gross_total is None else str(invoice.gross_total),
+            invoice.currency or "N/A",
         )
+        for invoice in invoices[:10]
+    ]
+    for row in rows:
+        table.add_row(*row)
 
     if len(invoices) > 10:
         table.add_row("...", "...", "...", "...", "...", "...", style="dim")
@@ -174,9 +252,56 @@ def _print_extraction_summary(invoices):
     console.print(table)
 
 
-def _print_validation_results(report: ValidationReport):
-    """Pretty-print validation report results"""
-    summary = report.summary
+def _print_validation_results(report: "ValidationReport", top: int = 20, cache_dir: Optional[Path] = None):
+    """
+    Pretty-print validation report results.
+
+    The rendered output only depends on the summary, the row limit and the
+    terminal. When a cache directory is given it is cached there and
+    replayed on repeated runs over the same data instead of laying out the
+    Rich tables again; without one nothing is written.
+    """
+    if cache_dir is None:
+        _render_validation_summary(report.summary, top)
+        return
+
+    key = hashlib.sha1(
+        f"{_RENDER_CACHE_VERSION}:{top}:{console.width}:{console.color_system}:"
+        f"{report.summary.model_dump_json()}".encode()
+    ).hexdigest()
+    render_dir = cache_dir / "render"
+    cache_path = render_dir / f"{key}.txt"
+
+    try:
+        console.file.write(cache_path.read_text())
+        return
+    except OSError:
+        pass
+
+    with console.capture() as capture:
+        _render_validation_summary(report.summary, top)
+    rendered = capture.get()
+    console.file.write(rendered)
+
+    try:
+        render_dir.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(rendered)
+        _evict_oldest(render_dir, _RENDER_CACHE_MAX_ENTRIES)
+    except OSError:
+        pass
+
+
+def _evict_oldest(directory: Path, max_entries: int):
+    """Delete the least recently written .txt files beyond max_entries"""
+    entries = sorted(directory.glob("*.txt"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in entries[max_entries:]:
+        stale.unlink(missing_ok=True)
+
+
+def _render_validation_summary(summary: "ValidationSummary", top: int):
+    """Print the summary panel and top error/warning tables"""
+    from rich.panel import Panel
+    from rich.table import Table
 
     if summary.invalid_invoices == 0:
         status_text = "[bold green]✓ ALL INVOICES VALID[/bold green]"
@@ -203,7 +328,7 @@ With Warnings:      [yellow]{summary.invoices_with_warnings}[/yellow]
         error_table.add_column("Error Type", style="red")
         error_table.add_column("Count", justify="right")
 
-        for err, count in sorted(summary.error_counts.items(), key=lambda x: -x[1]):
+        for err, count in nlargest(top, summary.error_counts.items(), key=itemgetter(1)):
             error_table.add_row(err, str(count))
 
         console.print("\n[bold red]Top Errors:[/bold red]")
@@ -215,7 +340,7 @@ With Warnings:      [yellow]{summary.invoices_with_warnings}[/yellow]
         warning_table.add_column("Warning Type", style="yellow")
         warning_table.add_column("Count", justify="right")
 
-        for warn, count in sorted(summary.warning_counts.items(), key=lambda x: -x[1]):
+        for warn, count in nlargest(top, summary.warning_counts.items(), key=itemgetter(1)):
             warning_table.add_row(warn, str(count))
 
         console.print("\n[bold yellow]Top Warnings:[/bold yellow]")
@@ -3,41 +3,121 @@ PDF invoice extraction module.
 Extracts structured data from invoice PDFs with English logic.
 """
 
+import os
 import re
 import pdfplumber
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import List, Optional, Dict, Any, Iterator
 from decimal import Decimal
-from .schemas import Invoice, LineItem, Currency
+from .schemas import Invoice, LineItem, Currency, parse_any_date
+from .cache import ExtractionCache
+
+# Default extraction patterns for English invoices
+RAW_PATTERNS = {
+    "invoice_number": [
+        r"INVOICE\s*(?:#|Number|No\.?)\s*:?\s*([A-Z0-9\-\/]+)",
+        r"Inv\.\s*No\.?\s*:?\s*([A-Z0-9\-\/]+)",
+    ],
+    "invoice_date": [
+        r"DATE\s*:?\s*(\d{1,2}[\/\.\-]\d{1,2}[\/\.\-]\d{2,4})",
+        r"Invoice\s*Date\s*:?\s*(\d{1,2}[\/\.\-]\d{1,2}[\/\.\-]\d{2,4})",
+    ],
+    "due_date": [
+        r"Due\s*(?:after|by|date)\s*:?\s*(\d{1,2}[\/\.\-]\d{1,2}[\/\.\-]\d{2,4})",
+        r"Due\s*Date\s*:?\s*(\d{1,2}[\/\.\-]\d{1,2}[\/\.\-]\d{2,4})",
+    ],
+    "po_number": [
+        r"P\.?O\.?\s*(?:NUMBER|No\.?|#)\s*:?\s*([A-Z0-9\-\/]+)",
+        r"Purchase\s*Order\s*:?\s*([A-Z0-9\-\/]+)",
+    ],
+    "payment_terms": [
+        r"TERMS\s*:?\s*([^\n]+)",
+        r"Payment\s*Terms\s*:?\s*([^\n]+)",
+    ],
+}
+
+# Dates, in the order formats are tried
+DATE_FORMATS = (
+    "%d.%m.%Y", "%m.%d.%Y",  # Dot separators
+    "%Y-%m-%d", "%d-%m-%Y",  # Dash separators
+    "%d/%m/%Y", "%m/%d/%Y",  # Slash separators
+)
+
+# Party extraction
+SELLER_TITLE_RE = re.compile(r"^(?:INVOICE|TAX INVOICE|CREDIT NOTE)$", re.IGNORECASE)
+# Stop-words that indicate we've moved past the header/branding area. Matched
+# against the head of the document, so each alternative is anchored at the
+# first non-blank character of a line and never crosses a newline.
+SELLER_STOP_RE = re.compile(
+    r"^[^\S\n]*(?:" + "|".join([
+        r"(?:TO|BILL TO|SHIP TO|SOLD TO|BILLED TO):",
+        r"INVOICE[^\S\n]*(?:#|NO|NUMBER)",
+        r"DATE:",
+        r"PAGE",
+        r"DETAILS",
+    ]) + r")",
+    re.IGNORECASE | re.MULTILINE,
+)
+INVOICE_HASH_RE = re.compile(r"INVOICE\s*#", re.IGNORECASE)
+BUYER_KEYWORDS_RE = re.compile(r"(?=[BCST])(?:\bTO\b|BILL TO|SOLD TO|BILLED TO|CUSTOMER)", re.IGNORECASE)
+BUYER_STOP_WORDS = r"SHIP TO|INVOICE|DATE|QUANTITY|DESCRIPTION|ITEM|TOTAL|PAYMENT"
+BUYER_STOP_RE = re.compile(r"(" + BUYER_STOP_WORDS + r")", re.IGNORECASE)
+# Blank lines, then the run of non-blank lines that contain no stop word
+BUYER_BLOCK_RE = re.compile(
+    r"(?:[^\S\n]*\n)*"
+    r"((?:(?![^\n]*(?:" + BUYER_STOP_WORDS + r"))[^\S\n]*\S[^\n]*(?:\n|\Z))*)",
+    re.IGNORECASE,
+)
+
+# Currency codes, in priority (enum) order. The patterns are case-sensitive
+# and run against the uppercased text, after a plain substring check.
+CURRENCY_CODE_RES = [
+    (currency.value, re.compile(r"\b" + currency.value + r"\b"))
+    for currency in Currency
+]
+
+# Amounts and line items
+def _amount_pattern(keys: List[str]) -> re.Pattern:
+    """Key followed optionally by colon/symbol, then a number"""
+    # The leading class lets the regex engine skip positions that cannot start
+    # any key instead of trying every alternative at every character
+    first = "".join(sorted({key[0] for key in keys}))
+    return re.compile(
+        r"(?=[" + first + r"])(?:" + "|".join(keys) + r")\s*[:$€]?\s*([\d,\.]+)",
+        re.IGNORECASE,
+    )
+
+
+GROSS_TOTAL_RE = _amount_pattern(["TOTAL DUE", "AMOUNT DUE", "TOTAL PAYABLE", "GRAND TOTAL"])
+NET_TOTAL_RE = _amount_pattern(["SUBTOTAL", "SUB TOTAL", "NET TOTAL"])
+TAX_AMOUNT_RE = _amount_pattern(["SALES TAX", "TAX", "VAT", "TOTAL TAX"])
+# Line-item table header keywords per column
+HEADER_KEYWORDS = {
+    "description": ["description", "item", "product", "details"],
+    "quantity": ["qty", "quantity", "count"],
+    "unit_price": ["unit price", "price", "rate", "cost", "unit"],
+    "line_total": ["total", "amount", "extension"],
+}
+NON_NUMERIC_RE = re.compile(r"[^0-9\.]")
+TOTAL_FALLBACK_RE = re.compile(r"(?=T)\bTOTAL\s*[:$€]?\s*([\d,\.]+)", re.IGNORECASE)
+LINE_ITEM_RE = re.compile(r"^(\d+(?:\.\d+)?)\s+(.+?)\s+(\d+\.\d{2})\s+(\d+\.\d{2})$")
 
 
 class InvoiceExtractor:
     """Extracts structured invoice data from English PDF files"""
 
     def __init__(self):
-        # Default extraction patterns for English invoices
+        # Compile once per extractor instead of on every search call
         self.patterns = {
-            "invoice_number": [
-                r"INVOICE\s*(?:#|Number|No\.?)\s*:?\s*([A-Z0-9\-\/]+)",
-                r"Inv\.\s*No\.?\s*:?\s*([A-Z0-9\-\/]+)",
-            ],
-            "invoice_date": [
-                r"DATE\s*:?\s*(\d{1,2}[\/\.\-]\d{1,2}[\/\.\-]\d{2,4})",
-                r"Invoice\s*Date\s*:?\s*(\d{1,2}[\/\.\-]\d{1,2}[\/\.\-]\d{2,4})",
-            ],
-            "due_date": [
-                r"Due\s*(?:after|by|date)\s*:?\s*(\d{1,2}[\/\.\-]\d{1,2}[\/\.\-]\d{2,4})",
-                r"Due\s*Date\s*:?\s*(\d{1,2}[\/\.\-]\d{1,2}[\/\.\-]\d{2,4})",
-            ],
-            "po_number": [
-                r"P\.?O\.?\s*(?:NUMBER|No\.?|#)\s*:?\s*([A-Z0-9\-\/]+)",
-                r"Purchase\s*Order\s*:?\s*([A-Z0-9\-\/]+)",
-            ],
-            "payment_terms": [
-                r"TERMS\s*:?\s*([^\n]+)",
-                r"Payment\s*Terms\s*:?\s*([^\n]+)",
-            ],
+            field: [re.compile(p, re.IGNORECASE | re.MULTILINE) for p in patterns]
+            for field, patterns in RAW_PATTERNS.items()
+        }
+        # One alternation per field so the common case scans the text once.
+        # Pattern i owns capture group i + 1.
+        self.combined_patterns = {
+            field: re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE | re.MULTILINE)
+            for field, patterns in RAW_PATTERNS.items()
         }
 
         self.currency_symbols = {
@@ -46,17 +126,36 @@ class InvoiceExtractor:
             "£": "GBP",
             "₹": "INR",
         }
+        self._symbol_set = frozenset(self.currency_symbols)
+
+        # One alternation per line-item column, matched against lowercased header cells
+        self._header_res = {
+            column: re.compile("|".join(re.escape(k) for k in keywords))
+            for column, keywords in HEADER_KEYWORDS.items()
+        }
+
+    def warm_up(self) -> None:
+        """
+        Run the text-parsing path once on empty input.
+
+        Long-running services call this at startup so the first real
+        request does not pay for lazy set-up (regex and date-format caches).
+        """
+        self._parse_invoice_text("")
 
     # ----------------------------------------------------------------------
     # EXTRACTION ENTRY POINTS
     # ----------------------------------------------------------------------
-    def extract_from_directory(self, pdf_dir: Path) -> List[Invoice]:
+    def extract_from_directory(self, pdf_dir: Path, cache: Optional[ExtractionCache] = None) -> List[Invoice]:
         pdf_dir = Path(pdf_dir)
         invoices = []
 
         for pdf_file in pdf_dir.glob("*.pdf"):
             try:
-                invoice = self.extract_from_pdf(pdf_file)
+                if cache is not None:
+                    invoice = self._extract_cached(pdf_file, cache)
+                else:
+                    invoice = self.extract_from_pdf(pdf_file)
                 if invoice:
                     invoices.append(invoice)
             except Exception as e:
@@ -64,21 +163,150 @@ class InvoiceExtractor:
 
         return invoices
 
+    def extract_from_directory_parallel(
+        self,
+        pdf_dir: Path,
+        workers: Optional[int] = None,
+        cache: Optional[ExtractionCache] = None,
+        executor: Optional[Executor] = None,
+    ) -> List[Invoice]:
+        """
+        Extract all PDFs in a directory using a pool of worker processes.
+
+        PDF parsing is CPU-bound and independent per file, so each PDF is
+        handed to a separate process. Long-running callers pass their own
+        process pool as executor so it is started once and shared; otherwise
+        a pool is created for this call. Falls back to in-process extraction
+        when there is only one worker or one file to parse.
+        """
+        pdf_files = list(Path(pdf_dir).glob("*.pdf"))
+        results: Dict[Path, Optional[Invoice]] = {}
+        file_hashes: Dict[Path, str] = {}
+
+        if cache is not None:
+            for pdf_file in pdf_files:
+                sha = cache.hash_file(pdf_file)
+                invoice = self._load_cached(pdf_file, sha, cache)
+                if invoice is not None:
+                    results[pdf_file] = invoice
+                else:
+                    file_hashes[pdf_file] = sha
+
+        pending = [pdf_file for pdf_file in pdf_files if pdf_file not in results]
+        workers = min(workers or os.cpu_count() or 1, len(pending))
+
+        if workers > 1:
+            chunksize = max(1, len(pending) // (workers * 4))
+            if executor is not None:
+                extracted = list(executor.map(_extract_one, pending, chunksize=chunksize))
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    extracted = list(pool.map(_extract_one, pending, chunksize=chunksize))
+        else:
+            extracted = [self.extract_from_pdf(pdf_file) for pdf_file in pending]
+
+        for pdf_file, invoice in zip(pending, extracted):
+            results[pdf_file] = invoice
+            if invoice and pdf_file in file_hashes:
+                cache.put(file_hashes[pdf_file], invoice.model_dump(mode="json"))
+
+        return [results[pdf_file] for pdf_file in pdf_files if results[pdf_file]]
+
+    def extract_from_directory_iter(
+        self,
+        pdf_dir: Path,
+        workers: Optional[int] = None,
+        cache: Optional[ExtractionCache] = None,
+    ) -> Iterator[Invoice]:
+        """
+        Yield invoices from a directory as soon as each PDF is extracted.
+
+        Same worker pool as extract_from_directory_parallel, but results come
+        back in completion order (cache hits first), so callers can start on
+        the first invoices while the rest are still being parsed.
+        """
+        cached: List[Invoice] = []
+        pending: List[Path] = []
+        file_hashes: Dict[Path, str] = {}
+
+        for pdf_file in Path(pdf_dir).glob("*.pdf"):
+            if cache is not None:
+                sha = cache.hash_file(pdf_file)
+                invoice = self._load_cached(pdf_file, sha, cache)
+                if invoice is not None:
+                    cached.append(invoice)
+                    continue
+                file_hashes[pdf_file] = sha
+            pending.append(pdf_file)
+
+        workers = min(workers or os.cpu_count() or 1, len(pending))
+        if workers <= 1:
+            yield from cached
+            for pdf_file in pending:
+                invoice = self.extract_from_pdf(pdf_file)
+                if invoice:
+                    if pdf_file in file_hashes:
+                        cache.put(file_hashes[pdf_file], invoice.model_dump(mode="json"))
+                    yield invoice
+            return
+
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            # Submit before yielding anything so workers start immediately
+            futures = {executor.submit(_extract_one, pdf_file): pdf_file for pdf_file in pending}
+            yield from cached
+            for future in as_completed(futures):
+                invoice = future.result()
+                if invoice:
+                    pdf_file = futures[future]
+                    if pdf_file in file_hashes:
+                        cache.put(file_hashes[pdf_file], invoice.model_dump(mode="json"))
+                    yield invoice
+        finally:
+            # Don't keep parsing files nobody will read if the caller stops early
+            executor.shutdown(cancel_futures=True)
+
+    def _load_cached(self, pdf_path: Path, sha: str, cache: ExtractionCache) -> Optional[Invoice]:
+        cached = cache.get(sha)
+        if cached is None:
+            return None
+        # Same bytes may have been uploaded under a different name
+        cached["source_file"] = pdf_path.name
+        return Invoice.model_validate(cached)
+
+    def _extract_cached(self, pdf_path: Path, cache: ExtractionCache) -> Optional[Invoice]:
+        """Extract a PDF, skipping parsing when its content hash is cached"""
+        sha = cache.hash_file(pdf_path)
+        invoice = self._load_cached(pdf_path, sha, cache)
+        if invoice is not None:
+            return invoice
+
+        invoice = self.extract_from_pdf(pdf_path)
+        if invoice:
+            cache.put(sha, invoice.model_dump(mode="json"))
+        return invoice
+
     def extract_from_pdf(self, pdf_path: Path) -> Optional[Invoice]:
         try:
             with pdfplumber.open(pdf_path) as pdf:
-                full_text = ""
+                # Single pass over the pages: text and tables share one parse of
+                # each page, which is released before moving on to the next
+                page_texts = []
+                page_tables = []
                 for page in pdf.pages:
-                    extracted = page.extract_text()
-                    if extracted:
-                        full_text += extracted + "\n"
+                    page_texts.append(page.extract_text() or "")
+                    page_tables.append(self._extract_page_tables(page))
+                    page.close()
+                full_text = "".join(text + "\n" for text in page_texts if text)
 
                 # Parse structured data
                 invoice_data = self._parse_invoice_text(full_text)
                 invoice_data["source_file"] = pdf_path.name
 
                 # Extract line items
-                line_items = self._extract_line_items(pdf)
+                line_items = self._extract_line_items_from_tables(page_tables, page_texts)
+                if not line_items:
+                    line_items = self._extract_layout_line_items(pdf)
                 if line_items:
                     invoice_data["line_items"] = line_items
 
@@ -95,32 +323,28 @@ class InvoiceExtractor:
         data = {}
 
         # Invoice number
-        data["invoice_number"] = self._extract_with_patterns(text, self.patterns["invoice_number"])
+        data["invoice_number"] = self._extract_field(text, "invoice_number")
 
         # Invoice date
-        invoice_date_str = self._extract_with_patterns(text, self.patterns["invoice_date"])
+        invoice_date_str = self._extract_field(text, "invoice_date")
         if invoice_date_str:
             data["invoice_date"] = self._parse_date(invoice_date_str)
 
         # Due date
-        # Check for relative due date text first (e.g. "Due after 30 days")
-        due_text = self._extract_with_patterns(text, self.patterns["payment_terms"])
-        if due_text and "days" in due_text.lower():
-            # Logic to calculate due date could go here, but for now we look for explicit dates
-            pass
-            
-        due_date_str = self._extract_with_patterns(text, self.patterns["due_date"])
+        # Relative due dates (e.g. "Due after 30 days") are not resolved yet,
+        # so only explicit dates are used
+        due_date_str = self._extract_field(text, "due_date")
         if due_date_str:
             data["due_date"] = self._parse_date(due_date_str)
 
         # PO / external reference
-        data["external_reference"] = self._extract_with_patterns(text, self.patterns["po_number"])
+        data["external_reference"] = self._extract_field(text, "po_number")
 
         # Payment terms
-        data["payment_terms"] = self._extract_with_patterns(text, self.patterns["payment_terms"])
+        data["payment_terms"] = self._extract_field(text, "payment_terms")
 
         # Seller/buyer extraction
-        parties = self._extract_parties(text)
+        parties = self._extract_parties(text, text.split('\n'))
         data.update(parties)
 
         # Currency
@@ -135,70 +359,50 @@ class InvoiceExtractor:
     # ----------------------------------------------------------------------
     # REGEX HELPERS
     # ----------------------------------------------------------------------
-    def _extract_with_patterns(self, text: str, patterns: List[str]) -> Optional[str]:
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
-            if match:
-                return match.group(1).strip()
-        return None
+    def _extract_field(self, text: str, field: str) -> Optional[str]:
+        match = self.combined_patterns[field].search(text)
+        if not match:
+            return None
+
+        # The leftmost match wins in an alternation, but earlier patterns take
+        # priority over later ones. If a lower-priority pattern matched, an
+        # earlier one can only match further on, so resume from there.
+        index = match.lastindex - 1
+        for pattern in self.patterns[field][:index]:
+            earlier = pattern.search(text, match.start())
+            if earlier:
+                return earlier.group(1).strip()
+        return match.group(index + 1).strip()
 
     def _parse_date(self, date_str: str) -> Optional[str]:
-        date_formats = [
-            "%d.%m.%Y", "%m.%d.%Y",  # Dot separators
-            "%Y-%m-%d", "%d-%m-%Y",  # Dash separators
-            "%d/%m/%Y", "%m/%d/%Y",  # Slash separators
-        ]
-        for fmt in date_formats:
-            try:
-                return datetime.strptime(date_str, fmt).date().isoformat()
-            except ValueError:
-                continue
-        return None
+        parsed = parse_any_date(date_str, DATE_FORMATS)
+        return parsed.isoformat() if parsed else None
 
     # ----------------------------------------------------------------------
     # PARTY EXTRACTION
     # ----------------------------------------------------------------------
-    def _extract_parties(self, text: str) -> Dict[str, Any]:
+    def _extract_parties(self, text: str, lines: Optional[List[str]] = None) -> Dict[str, Any]:
         data = {}
 
         # ------------------------------------------------------------------
         # Heuristic: Seller is often at the top-left or centered at top.
         # We look at the first few non-empty lines, skipping known headers.
         
-        lines = text.split('\n')
-        seller_lines = []
-        
-        # Stop-words that indicate we've moved past the header/branding area
-        header_stop_patterns = [
-            r"^(?:TO|BILL TO|SHIP TO|SOLD TO|BILLED TO):", 
-            r"^INVOICE\s*(?:#|NO|NUMBER)", 
-            r"^DATE:", 
-            r"^PAGE",
-            r"^DETAILS"
+        if lines is None:
+            lines = text.split('\n')
+        # Only check the top section, up to the first stop line
+        head = "\n".join(lines[:20])
+        stop = SELLER_STOP_RE.search(head)
+        if stop:
+            head = head[:stop.start()]
+
+        # Skip generic document titles if they appear alone, and filter metadata
+        # (e.g. if the invoice number appears on the same line). Usually top
+        # lines are Name, Address, Phone.
+        cleaned_seller_lines = [
+            line for line in map(str.strip, head.split('\n'))
+            if line and not SELLER_TITLE_RE.match(line) and not INVOICE_HASH_RE.search(line)
         ]
-        
-        for line in lines[:20]: # Only check top section
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Skip generic document titles if they appear alone
-            if re.match(r"^(?:INVOICE|TAX INVOICE|CREDIT NOTE)$", line, re.IGNORECASE):
-                continue
-
-            # Check if we hit a stop section
-            if any(re.search(p, line, re.IGNORECASE) for p in header_stop_patterns):
-                break
-                
-            seller_lines.append(line)
-        
-        # Filter metadata from collected seller lines (e.g. if Date appears on same line)
-        cleaned_seller_lines = []
-        for l in seller_lines:
-             # Basic filter: if line looks like a date or invoice number, skip/clean it
-             # But usually top lines are Name, Address, Phone.
-             if re.search(r"INVOICE\s*#", l, re.IGNORECASE): continue
-             cleaned_seller_lines.append(l)
 
         if cleaned_seller_lines:
             data["seller_name"] = cleaned_seller_lines[0]
@@ -218,51 +422,28 @@ class InvoiceExtractor:
         # (.*?)                                 --> Capture content (lazy)
         # (?=\n\s*\n|\bSHIP TO\b|\bINVOICE\b|...) --> Stop text (Lookahead)
         
-        buyer_keywords = r"(?:\bTO\b|BILL TO|SOLD TO|BILLED TO|CUSTOMER)"
-        
-        # Find all start positions
-        matches = list(re.finditer(buyer_keywords, text, re.IGNORECASE))
-        
-        if matches:
-            # Usually the first match is the main Bill-To
-            match = matches[0]
+        # Usually the first match is the main Bill-To
+        match = BUYER_KEYWORDS_RE.search(text)
+
+        if match:
             start_idx = match.end()
             
             # Special case: check if there is text on the SAME line after the colon
             # e.g. "Bill To: Acme Corp"
             # match.end() gives index after "Bill To", we check up to newline
             next_newline = text.find('\n', start_idx)
+            if next_newline == -1:
+                next_newline = len(text)
             same_line_content = text[start_idx:next_newline].strip(" :-\t")
             
-            buyer_candidates = []
-            
             if same_line_content:
-                buyer_candidates.append(same_line_content)
-                # Then grab subsequent lines
-                search_start = next_newline
+                # The block ends at the newline that follows it
+                buyer_candidates = [same_line_content]
             else:
-                search_start = start_idx
-            
-            # Grab next chunk of lines
-            chunk = text[search_start:search_start+500]
-            chunk_lines = chunk.split('\n')
-            
-            for line in chunk_lines:
-                line = line.strip()
-                if not line:
-                    # Allow 1 empty line gap, but stop at second? 
-                    # Actually standard invoice blocks are contiguous.
-                    # If we already have candidates and hit empty, we might stop or continue depending on layout.
-                    # For safety, if we have a name, empty line might mean end of block.
-                    if buyer_candidates:
-                        break # Assume block end
-                    continue
-                
-                # Check for stop keywords (other sections)
-                if re.search(r"(SHIP TO|INVOICE|DATE|QUANTITY|DESCRIPTION|ITEM|TOTAL|PAYMENT)", line, re.IGNORECASE):
-                    break
-                    
-                buyer_candidates.append(line)
+                # Otherwise take the following non-empty lines (within the next
+                # 500 characters) up to a blank line or another section's keyword
+                block = BUYER_BLOCK_RE.match(text, start_idx, start_idx + 500)
+                buyer_candidates = [line.strip() for line in block.group(1).split('\n') if line.strip()]
             
             if buyer_candidates:
                 data["buyer_name"] = buyer_candidates[0]
@@ -279,15 +460,19 @@ class InvoiceExtractor:
     # CURRENCY & AMOUNTS
     # ----------------------------------------------------------------------
     def _extract_currency(self, text: str) -> Optional[str]:
-        # Check symbols first
-        for symbol, code in self.currency_symbols.items():
-            if symbol in text:
+        # Check symbols first: one pass over the text collects every symbol present
+        present = self._symbol_set.intersection(text)
+        if present:
+            for symbol, code in self.currency_symbols.items():
+                if symbol in present:
+                    return code
+
+        # Check codes: substring tests are cheap, so only confirm word
+        # boundaries for codes that actually occur in the text
+        text_upper = text.upper()
+        for code, pattern in CURRENCY_CODE_RES:
+            if code in text_upper and pattern.search(text_upper):
                 return code
-        
-        # Check codes
-        for currency in Currency:
-            if re.search(r"\b" + currency.value + r"\b", text, re.IGNORECASE):
-                return currency.value
 
         return "USD"
 
@@ -299,7 +484,7 @@ class InvoiceExtractor:
                 return None
             # Standard English: remove characters that aren't digits or dots
             # Note: Dealing with thousands separators (commas) by removing them
-            cleaned = re.sub(r"[^0-9\.]", "", s.replace(',', ''))
+            cleaned = NON_NUMERIC_RE.sub("", s.replace(',', ''))
             try:
                 return Decimal(cleaned)
             except:
@@ -307,38 +492,35 @@ class InvoiceExtractor:
 
         # Helper to find values associated with keys at end of lines
         # e.g. "TOTAL DUE 576.95" or "TOTAL DUE: 576.95"
-        def find_value(keys: List[str]) -> Optional[Decimal]:
-            for key in keys:
-                # Pattern: Key followed optionally by colon/symbol, then number at END of line or text
-                pattern = r"(?:" + "|".join(keys) + r")\s*[:$€]?\s*([\d,\.]+)"
-                # We want the match that is likely the final amount, not a line item description
-                # Searching line by line is safer for totals usually at the bottom
-                matches = list(re.finditer(pattern, text, re.IGNORECASE))
-                if matches:
-                    # Take the last match as totals usually appear at bottom
-                    return clean_number(matches[-1].group(1))
+        def find_value(pattern: re.Pattern) -> Optional[Decimal]:
+            # We want the match that is likely the final amount, not a line item description
+            # Searching line by line is safer for totals usually at the bottom
+            matches = list(pattern.finditer(text))
+            if matches:
+                # Take the last match as totals usually appear at bottom
+                return clean_number(matches[-1].group(1))
             return None
 
         # Gross Total
         # Prioritize specific "Total Due" labels over generic "Total"
-        gross = find_value(["TOTAL DUE", "AMOUNT DUE", "TOTAL PAYABLE", "GRAND TOTAL"])
+        gross = find_value(GROSS_TOTAL_RE)
         if gross:
             data["gross_total"] = gross
         else:
             # Fallback to just "TOTAL" but be careful not to pick up column header
             # Regex ensures it matches a number
-            match = re.search(r"\bTOTAL\s*[:$€]?\s*([\d,\.]+)", text, re.IGNORECASE)
+            match = TOTAL_FALLBACK_RE.search(text)
             if match:
                  # Verify it's not the header "TOTAL" which usually isn't followed immediately by a number
                  data["gross_total"] = clean_number(match.group(1))
 
         # Subtotal
-        sub = find_value(["SUBTOTAL", "SUB TOTAL", "NET TOTAL"])
+        sub = find_value(NET_TOTAL_RE)
         if sub:
             data["net_total"] = sub
 
         # Tax
-        tax = find_value(["SALES TAX", "TAX", "VAT", "TOTAL TAX"])
+        tax = find_value(TAX_AMOUNT_RE)
         if tax:
             data["tax_amount"] = tax
 
@@ -351,22 +533,34 @@ class InvoiceExtractor:
     # ----------------------------------------------------------------------
     # LINE ITEMS
     # ----------------------------------------------------------------------
-    def _extract_line_items(self, pdf) -> List[Dict[str, Any]]:
+    def _extract_page_tables(self, page) -> List[List[List[Optional[str]]]]:
+        try:
+            return page.extract_tables()
+        except Exception as e:
+            print(f"Error extracting line items: {e}")
+            return []
+
+    def _extract_line_items_from_tables(
+        self,
+        page_tables: List[List[List[Optional[str]]]],
+        page_texts: List[str],
+    ) -> List[Dict[str, Any]]:
+        """Line items from already extracted page tables, or page text if no table matches"""
         line_items = []
 
         try:
             # Strategy 1: Table Extraction (Works if PDF has grid lines)
-            for page in pdf.pages:
-                tables = page.extract_tables()
+            for tables in page_tables:
                 for table in tables:
                     if not table or len(table) < 2:
                         continue
                     
-                    header = table[0]
-                    desc_col = self._find_column_index(header, ["description", "item", "product", "details"])
-                    qty_col = self._find_column_index(header, ["qty", "quantity", "count"])
-                    price_col = self._find_column_index(header, ["unit price", "price", "rate", "cost", "unit"])
-                    total_col = self._find_column_index(header, ["total", "amount", "extension"])
+                    # Lowercase the header once for all four column lookups
+                    header = [str(c).lower().replace('\n', ' ') if c else "" for c in table[0]]
+                    desc_col = self._find_column_index(header, "description")
+                    qty_col = self._find_column_index(header, "quantity")
+                    price_col = self._find_column_index(header, "unit_price")
+                    total_col = self._find_column_index(header, "line_total")
                     
                     # If we found at least a description column
                     if desc_col is not None:
@@ -387,11 +581,11 @@ class InvoiceExtractor:
                                 except: pass
                             
                             if price_col is not None:
-                                try: item["unit_price"] = Decimal(re.sub(r"[^0-9\.]", "", clean_row[price_col]))
+                                try: item["unit_price"] = Decimal(NON_NUMERIC_RE.sub("", clean_row[price_col]))
                                 except: pass
                                 
                             if total_col is not None:
-                                try: item["line_total"] = Decimal(re.sub(r"[^0-9\.]", "", clean_row[total_col]))
+                                try: item["line_total"] = Decimal(NON_NUMERIC_RE.sub("", clean_row[total_col]))
                                 except: pass
                             
                             if item.get("description") and (item.get("line_total") or item.get("quantity")):
@@ -399,44 +593,97 @@ class InvoiceExtractor:
             
             # Strategy 2: Text-based Regex fallback (if tables failed)
             if not line_items:
-                full_text = ""
-                for page in pdf.pages:
-                     # Layout=True helps preserve horizontal positioning
-                     full_text += page.extract_text(layout=True) + "\n"
-                
-                # Simple pattern: Quantity (number) ... Description (text) ... Price (number) ... Total (number)
-                # This is fragile but handles the "no grid lines" case better
-                # Look for lines starting with a number (quantity)
-                lines = full_text.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if not line: continue
-                    
-                    # Regex: Start with Number (Qty), space, Description, space, Number (Price), space, Number (Total)
-                    # 10 Dextromethorphan polistirex 12.45 124.50
-                    match = re.search(r"^(\d+(?:\.\d+)?)\s+(.+?)\s+(\d+\.\d{2})\s+(\d+\.\d{2})$", line)
-                    if match:
-                        qty, desc, price, total = match.groups()
-                        # Filter out things that look like dates or random numbers
-                        if " " not in desc and len(desc) < 3: continue 
-                        
-                        line_items.append({
-                            "quantity": float(qty),
-                            "description": desc.strip(),
-                            "unit_price": Decimal(price),
-                            "line_total": Decimal(total)
-                        })
+                line_items = self._match_line_items("\n".join(page_texts))
 
         except Exception as e:
             print(f"Error extracting line items: {e}")
 
         return line_items
 
-    def _find_column_index(self, header: List, keywords: List[str]) -> Optional[int]:
+    def _extract_layout_line_items(self, pdf) -> List[Dict[str, Any]]:
+        """Last resort: rebuild rows from word positions and match line items"""
+        try:
+            rows = []
+            for page in pdf.pages:
+                rows.extend(self._cluster_word_rows(page.extract_words()))
+                page.close()
+            return self._match_line_items("\n".join(rows))
+
+        except Exception as e:
+            print(f"Error extracting line items: {e}")
+            return []
+
+    def _cluster_word_rows(self, words: List[Dict[str, Any]]) -> List[str]:
+        """
+        Group words into text rows by vertical overlap, left to right.
+
+        Cheaper than extract_text(layout=True), which reflows every char into
+        a padded grid only for the line-item regex to collapse the spacing.
+        A word joins the current row when at least half of its height overlaps
+        the row, so a quantity centred on a two-line description still lands
+        on the description's first line.
+        """
+        rows = []
+        current = []
+        row_bottom = 0.0
+        for word in sorted(words, key=lambda w: (w["top"], w["x0"])):
+            overlap = row_bottom - word["top"]
+            if current and overlap * 2 >= word["bottom"] - word["top"]:
+                current.append(word)
+                continue
+            if current:
+                rows.append(" ".join(w["text"] for w in sorted(current, key=lambda w: w["x0"])))
+            current = [word]
+            row_bottom = word["bottom"]
+        if current:
+            rows.append(" ".join(w["text"] for w in sorted(current, key=lambda w: w["x0"])))
+        return rows
+
+    def _match_line_items(self, text: str) -> List[Dict[str, Any]]:
+        line_items = []
+
+        # Simple pattern: Quantity (number) ... Description (text) ... Price (number) ... Total (number)
+        # This is fragile but handles the "no grid lines" case better
+        # Look for lines starting with a number (quantity)
+        for line in text.split('\n'):
+            line = line.strip()
+            if not line: continue
+
+            # Regex: Start with Number (Qty), space, Description, space, Number (Price), space, Number (Total)
+            # 10 Dextromethorphan polistirex 12.45 124.50
+            match = LINE_ITEM_RE.search(line)
+            if match:
+                qty, desc, price, total = match.groups()
+                # Filter out things that look like dates or random numbers
+                if " " not in desc and len(desc) < 3: continue
+
+                line_items.append({
+                    "quantity": float(qty),
+                    "description": desc.strip(),
+                    "unit_price": Decimal(price),
+                    "line_total": Decimal(total)
+                })
+
+        return line_items
+
+    def _find_column_index(self, header: List[str], column: str) -> Optional[int]:
+        """Index of the first header cell (already lowercased) naming the column"""
+        header_re = self._header_res[column]
         for i, cell in enumerate(header):
-            if cell:
-                cell_lower = str(cell).lower().replace('\n', ' ')
-                for keyword in keywords:
-                    if keyword == cell_lower or keyword in cell_lower:
-                        return i
+            if cell and header_re.search(cell):
+                return i
         return None
+
+
+# ----------------------------------------------------------------------
+# PROCESS POOL WORKER
+# ----------------------------------------------------------------------
+_worker_extractor: Optional[InvoiceExtractor] = None
+
+
+def _extract_one(pdf_path: Path) -> Optional[Invoice]:
+    """Extract a single PDF inside a worker process (must be picklable)"""
+    global _worker_extractor
+    if _worker_extractor is None:
+        _worker_extractor = InvoiceExtractor()
+    return _worker_extractor.extract_from_pdf(pdf_path)
@@ -3,10 +3,12 @@ Invoice data models and schemas using Pydantic.
 These define the structure of extracted invoice data.
 """
 
+import re
 from datetime import date, datetime
 from decimal import Decimal
-from typing import Optional, List
-from pydantic import BaseModel, Field, field_validator
+from functools import lru_cache
+from typing import Optional, List, Iterator, Tuple, Dict
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
 from enum import Enum
 
 
@@ -18,6 +20,98 @@ class Currency(str, Enum):
     GBP = "GBP"
 
 
+# ----------------------------------------------------------------------
+# DATE PARSING
+# ----------------------------------------------------------------------
+_NUMERIC_DATE_RE = re.compile(r"^([0-9]{1,4})([./-])([0-9]{1,2})\2([0-9]{1,4})$")
+_NUMERIC_FORMAT_RE = re.compile(r"^%([dmY])([./-])%([dmY])\2%([dmY])$")
+_MONTH_DAY_YEAR_RE = re.compile(r"^([A-Za-z]+)\s+([0-9]{1,2}),\s+([0-9]{4})$")
+_DAY_MONTH_YEAR_RE = re.compile(r"^([0-9]{1,2})\s+([A-Za-z]+)\s+([0-9]{4})$")
+
+_MONTH_NAMES = ["january", "february", "march", "april", "may", "june", "july",
+                "august", "september", "october", "november", "december"]
+_FULL_MONTHS = {name: i for i, name in enumerate(_MONTH_NAMES, 1)}
+_ABBR_MONTHS = {name[:3]: i for i, name in enumerate(_MONTH_NAMES, 1)}
+_NAMED_FORMATS = ("%B %d, %Y", "%d %b %Y")
+
+# Formats accepted for dates on incoming invoice JSON, in order of precedence
+INVOICE_DATE_FORMATS = (
+    '%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d.%m.%Y',
+    '%d-%m-%Y', '%B %d, %Y', '%d %b %Y'
+)
+
+
+@lru_cache(maxsize=None)
+def _date_plan(formats: Tuple[str, ...]) -> Tuple[Dict[str, List[Tuple[str, ...]]], List[str]]:
+    """
+    Split strptime formats into field orders per separator for the regex
+    fast path, keeping anything else for a strptime fallback.
+    """
+    orders: Dict[str, List[Tuple[str, ...]]] = {}
+    others = []
+    for fmt in formats:
+        match = _NUMERIC_FORMAT_RE.match(fmt)
+        if match:
+            first, sep, second, third = match.groups()
+            orders.setdefault(sep, []).append((first, second, third))
+        else:
+            others.append(fmt)
+    return orders, others
+
+
+def parse_any_date(value: str, formats: Tuple[str, ...]) -> Optional[date]:
+    """
+    Parse a date string with the first matching format, like trying
+    datetime.strptime with each format in turn.
+
+    Numeric day/month/year formats and the English '%B %d, %Y' and
+    '%d %b %Y' formats are resolved with one regex match and int()
+    instead of raising and catching ValueError per format.
+    """
+    orders, others = _date_plan(formats)
+
+    numeric = _NUMERIC_DATE_RE.match(value)
+    if numeric:
+        first, sep, second, third = numeric.groups()
+        for order in orders.get(sep, ()):
+            fields = dict(zip(order, (first, second, third)))
+            if len(fields["Y"]) != 4 or len(fields["m"]) > 2 or len(fields["d"]) > 2:
+                continue
+            try:
+                return date(int(fields["Y"]), int(fields["m"]), int(fields["d"]))
+            except ValueError:
+                continue
+        # Only formats outside the numeric fast path could still match
+        fallback = [fmt for fmt in others if fmt not in _NAMED_FORMATS]
+    else:
+        if "%B %d, %Y" in others:
+            match = _MONTH_DAY_YEAR_RE.match(value)
+            month = _FULL_MONTHS.get(match.group(1).lower()) if match else None
+            if month:
+                try:
+                    return date(int(match.group(3)), month, int(match.group(2)))
+                except ValueError:
+                    pass
+
+        if "%d %b %Y" in others:
+            match = _DAY_MONTH_YEAR_RE.match(value)
+            month = _ABBR_MONTHS.get(match.group(2).lower()) if match else None
+            if month:
+                try:
+                    return date(int(match.group(3)), month, int(match.group(1)))
+                except ValueError:
+                    pass
+        fallback = formats
+
+    # Anything the fast paths do not cover goes through strptime
+    for fmt in fallback:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
 class LineItem(BaseModel):
     """Individual line item in an invoice"""
     description: Optional[str] = Field(None, description="Product/service description")
@@ -27,6 +121,8 @@ class LineItem(BaseModel):
     tax_rate: Optional[float] = Field(None, description="Tax rate percentage", ge=0, le=100)
     
     class Config:
+        # Line items are shared between copies of deduplicated invoices
+        frozen = True
         json_encoders = {
             Decimal: lambda v: float(v)
         }
@@ -103,15 +199,9 @@ class Invoice(BaseModel):
             # Clean string
             v = v.strip()
             # Try common date formats (English & International)
-            formats = [
-                '%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d.%m.%Y',
-                '%d-%m-%Y', '%B %d, %Y', '%d %b %Y'
-            ]
-            for fmt in formats:
-                try:
-                    return datetime.strptime(v, fmt).date()
-                except ValueError:
-                    continue
+            parsed = parse_any_date(v, INVOICE_DATE_FORMATS)
+            if parsed is not None:
+                return parsed
         return v
 
 
@@ -121,6 +211,9 @@ class ValidationError(BaseModel):
     field: Optional[str] = Field(None, description="Field that caused the error")
     message: str = Field(..., description="Human-readable error message")
     severity: str = Field(default="error", description="error, warning, or info")
+    
+    class Config:
+        frozen = True
 
 
 class ValidationResult(BaseModel):
@@ -159,4 +252,14 @@ class ValidationReport(BaseModel):
     class Config:
         json_encoders = {
             datetime: lambda v: v.isoformat()
-        }
\ No newline at end of file
+        }
+    
+    def iter_results_json(self) -> Iterator[bytes]:
+        """Yield each result as a compact JSON document (one per JSONL line)"""
+        for result in self.results:
+            yield result.model_dump_json().encode()
+
+
+# Validators/serializers built once at import and reused for every batch
+INVOICE_LIST_ADAPTER = TypeAdapter(List[Invoice])
+REPORT_ADAPTER = TypeAdapter(ValidationReport)
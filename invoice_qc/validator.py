@@ -3,12 +3,25 @@ Invoice validation module.
 Implements validation rules for invoice quality control.
 """
 
+from collections import Counter
 from datetime import date, timedelta
 from decimal import Decimal
-from typing import List, Set
+from typing import Dict, List, Optional, Set
 from .schemas import Invoice, ValidationResult, ValidationSummary, ValidationReport, Currency
 
 
+# Known currency codes, built once instead of per invoice
+_CURRENCY_VALUES = frozenset(c.value for c in Currency)
+
+# Completeness rules 1-3 as (field, rule, message); strings must also be non-blank
+_REQUIRED_FIELDS = (
+    ("invoice_number", "invoice_number_required", "Invoice number is required and cannot be empty"),
+    ("invoice_date", "invoice_date_required", "Invoice date is required"),
+    ("seller_name", "seller_name_required", "Seller name is required and cannot be empty"),
+    ("buyer_name", "buyer_name_required", "Buyer name is required and cannot be empty"),
+)
+
+
 class InvoiceValidator:
     """
     Validates invoices against defined business rules.
@@ -41,7 +54,11 @@ class InvoiceValidator:
             tolerance: Tolerance for amount matching (e.g., 0.02 = 2% tolerance for rounding)
         """
         self.tolerance = tolerance
-        self.seen_invoices: Set[tuple] = set()  # For duplicate detection
+        self._tol_decimal = Decimal(str(tolerance))
+        self._tol_float = float(tolerance)
+        self._eps = Decimal('0.01')  # Absolute tolerance when one side is zero
+        self.seen_invoices: Set[str] = set()  # For duplicates across validate_invoice calls
+        self._set_date_bounds()
     
     def validate_batch(self, invoices: List[Invoice]) -> ValidationReport:
         """
@@ -53,23 +70,27 @@ class InvoiceValidator:
         Returns:
             ValidationReport with summary and individual results
         """
-        self.seen_invoices.clear()  # Reset for each batch
+        self._set_date_bounds()  # Refresh "today" once per batch
+        seen: Set[str] = set()  # Local per batch, so concurrent batches don't share it
         results = []
         
         for invoice in invoices:
-            result = self.validate_invoice(invoice)
+            result = self.validate_invoice(invoice, seen)
             results.append(result)
         
         summary = self._create_summary(results)
         
         return ValidationReport(summary=summary, results=results)
     
-    def validate_invoice(self, invoice: Invoice) -> ValidationResult:
+    def validate_invoice(self, invoice: Invoice, seen: Optional[Set[str]] = None) -> ValidationResult:
         """
         Validate a single invoice against all rules.
         
         Args:
             invoice: Invoice to validate
+            seen: Duplicate keys seen so far (defaults to the validator's own
+                set, so standalone calls flag duplicates of earlier calls;
+                clear self.seen_invoices to start over)
             
         Returns:
             ValidationResult with errors and warnings
@@ -87,7 +108,7 @@ class InvoiceValidator:
         self._validate_business_rules(invoice, result)
         
         # ANOMALY RULES
-        self._validate_anomalies(invoice, result)
+        self._validate_anomalies(invoice, result, self.seen_invoices if seen is None else seen)
         
         return result
     
@@ -96,36 +117,11 @@ class InvoiceValidator:
     def _validate_completeness(self, invoice: Invoice, result: ValidationResult):
         """Validate that required fields are present and non-empty"""
         
-        # Rule 1: Invoice number required
-        if not invoice.invoice_number or not invoice.invoice_number.strip():
-            result.add_error(
-                rule="invoice_number_required",
-                field="invoice_number",
-                message="Invoice number is required and cannot be empty"
-            )
-        
-        # Rule 2: Invoice date required
-        if not invoice.invoice_date:
-            result.add_error(
-                rule="invoice_date_required",
-                field="invoice_date",
-                message="Invoice date is required"
-            )
-        
-        # Rule 3: Parties required (seller and buyer names)
-        if not invoice.seller_name or not invoice.seller_name.strip():
-            result.add_error(
-                rule="seller_name_required",
-                field="seller_name",
-                message="Seller name is required and cannot be empty"
-            )
-        
-        if not invoice.buyer_name or not invoice.buyer_name.strip():
-            result.add_error(
-                rule="buyer_name_required",
-                field="buyer_name",
-                message="Buyer name is required and cannot be empty"
-            )
+        # Rules 1-3: Invoice number, invoice date and parties required
+        for attr, rule, message in _REQUIRED_FIELDS:
+            value = getattr(invoice, attr)
+            if not value or (isinstance(value, str) and not value.strip()):
+                result.add_error(rule=rule, field=attr, message=message)
         
         # Rule 4: Key amounts required
         if invoice.gross_total is None:
@@ -141,7 +137,7 @@ class InvoiceValidator:
         """Validate data types and formats"""
         
         # Rule: Currency must be valid
-        if invoice.currency and invoice.currency not in [c.value for c in Currency]:
+        if invoice.currency and invoice.currency not in _CURRENCY_VALUES:
             result.add_error(
                 rule="invalid_currency",
                 field="currency",
@@ -192,10 +188,10 @@ class InvoiceValidator:
         
         # Rule 7: Line items sum should match net total
         if invoice.line_items and invoice.net_total is not None:
-            line_items_sum = sum(
-                (item.line_total for item in invoice.line_items if item.line_total),
-                start=Decimal(0)
-            )
+            # Sum a prefiltered list rather than a generator; zero totals
+            # add nothing, so only None needs to be skipped
+            line_totals = [item.line_total for item in invoice.line_items if item.line_total is not None]
+            line_items_sum = sum(line_totals, start=Decimal(0))
             
             if line_items_sum > 0 and not self._amounts_match(line_items_sum, invoice.net_total):
                 result.add_warning(
@@ -228,25 +224,27 @@ class InvoiceValidator:
     
     # ===== ANOMALY RULES =====
     
-    def _validate_anomalies(self, invoice: Invoice, result: ValidationResult):
+    def _validate_anomalies(self, invoice: Invoice, result: ValidationResult, seen: Set[str]):
         """Validate for anomalies and duplicates"""
         
         # Rule 9: Duplicate detection
         if invoice.invoice_number and invoice.seller_name:
+            # One unit-separator-joined string instead of a 3-tuple; a set
+            # that does not grow on add() means the key was already seen
             invoice_key = (
-                invoice.invoice_number.strip().upper(),
-                invoice.seller_name.strip().upper(),
-                str(invoice.invoice_date)
+                f"{invoice.invoice_number.strip().upper()}\x1f"
+                f"{invoice.seller_name.strip().upper()}\x1f"
+                f"{invoice.invoice_date}"
             )
             
-            if invoice_key in self.seen_invoices:
+            seen_before = len(seen)
+            seen.add(invoice_key)
+            if len(seen) == seen_before:
                 result.add_error(
                     rule="duplicate_invoice",
                     field="invoice_number",
                     message=f"Duplicate invoice detected: {invoice.invoice_number} from {invoice.seller_name}"
                 )
-            else:
-                self.seen_invoices.add(invoice_key)
         
         # Rule 10: Reasonable date range check (already in format validation)
         # This is covered in _validate_formats
@@ -265,45 +263,74 @@ class InvoiceValidator:
             return True
         
         if amount1 == 0 or amount2 == 0:
-            return abs(amount1 - amount2) < Decimal('0.01')
+            return abs(amount1 - amount2) < self._eps
+        
+        # Float pre-check: a ratio clearly inside or outside the tolerance
+        # decides it (the 1e-12 slack dwarfs float rounding); borderline,
+        # underflowing or non-finite values fall through to the exact check
+        f1, f2 = float(amount1), float(amount2)
+        scale = abs(f1) + abs(f2)
+        if scale:
+            ratio = 2 * abs(f1 - f2) / scale
+            if ratio + 1e-12 <= self._tol_float * 0.5:
+                return True
+            if ratio - 1e-12 > self._tol_float * 2:
+                return False
         
         difference = abs(amount1 - amount2)
         avg = (abs(amount1) + abs(amount2)) / 2
         
-        return difference / avg <= Decimal(str(self.tolerance))
+        return difference / avg <= self._tol_decimal
+    
+    def _set_date_bounds(self):
+        """Compute the reasonable date range relative to today"""
+        today = date.today()
+        self._min_date = today - timedelta(days=365 * 10)  # 10 years ago
+        self._max_date = today + timedelta(days=365 * 2)   # 2 years in future
     
     def _is_reasonable_date(self, check_date: date) -> bool:
         """Check if date is within reasonable range (10 years past to 2 years future)"""
-        today = date.today()
-        min_date = today - timedelta(days=365 * 10)  # 10 years ago
-        max_date = today + timedelta(days=365 * 2)   # 2 years in future
-        
-        return min_date <= check_date <= max_date
+        return self._min_date <= check_date <= self._max_date
     
     def _create_summary(self, results: List[ValidationResult]) -> ValidationSummary:
         """Create summary statistics from validation results"""
         total = len(results)
-        valid = sum(1 for r in results if r.is_valid)
-        invalid = total - valid
-        with_warnings = sum(1 for r in results if r.warnings)
+        valid = 0
+        with_warnings = 0
         
-        error_counts = {}
-        warning_counts = {}
+        # Count by (rule, field) and format each key once per distinct kind
+        error_counter = Counter()
+        warning_counter = Counter()
         
+        # Single pass over the results for every tally
         for result in results:
+            if result.is_valid:
+                valid += 1
+            
             for error in result.errors:
-                key = f"{error.rule}: {error.field}" if error.field else error.rule
-                error_counts[key] = error_counts.get(key, 0) + 1
+                error_counter[(error.rule, error.field)] += 1
             
-            for warning in result.warnings:
-                key = f"{warning.rule}: {warning.field}" if warning.field else warning.rule
-                warning_counts[key] = warning_counts.get(key, 0) + 1
+            if result.warnings:
+                with_warnings += 1
+                for warning in result.warnings:
+                    warning_counter[(warning.rule, warning.field)] += 1
+        
+        invalid = total - valid
         
         return ValidationSummary(
             total_invoices=total,
             valid_invoices=valid,
             invalid_invoices=invalid,
             invoices_with_warnings=with_warnings,
-            error_counts=error_counts,
-            warning_counts=warning_counts
-        )
\ No newline at end of file
+            error_counts=self._format_counts(error_counter),
+            warning_counts=self._format_counts(warning_counter)
+        )
+    
+    @staticmethod
+    def _format_counts(counter: Counter) -> Dict[str, int]:
+        """Turn (rule, field) counts into "rule: field" keyed counts"""
+        counts: Dict[str, int] = {}
+        for (rule, field), count in counter.items():
+            key = f"{rule}: {field}" if field else rule
+            counts[key] = counts.get(key, 0) + count
+        return counts
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+In-process tests for the FastAPI app
+"""
+
+from concurrent.futures import Executor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+import time
+from starlette.datastructures import UploadFile
+from fastapi.testclient import TestClient
+import api.main as api_main
+from api.main import app
+from invoice_qc.cache import ExtractionCache
+
+PDF_DIR = Path(__file__).parent.parent / "pdfs"
+
+
+def test_validate_json_fast_rejects_malformed_body():
+    """Test that a body that is not JSON gets a 422, not a server error"""
+    with TestClient(app) as client:
+        response = client.post(
+            "/validate-json-fast",
+            content=b"garbage",
+            headers={"Content-Type": "application/json"}
+        )
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["type"] == "json_invalid"
+
+
+def _two_distinct_pdfs():
+    """Multipart files for two different PDFs with the same content"""
+    pdf_bytes = next(PDF_DIR.glob("*.pdf")).read_bytes()
+    # A trailing PDF comment changes the digest without changing the content
+    variant = pdf_bytes + b"\n% variant\n"
+    return [
+        ("files", ("a.pdf", pdf_bytes, "application/pdf")),
+        ("files", ("b.pdf", variant, "application/pdf")),
+    ]
+
+
+def test_multi_file_uploads_share_one_process_pool(monkeypatch):
+    """Test that multi-file uploads succeed and reuse the app's process pool"""
+    monkeypatch.setattr(api_main, "EXTRACT_PROCESSES", 2)
+    monkeypatch.delenv("INVOICE_QC_CACHE_DIR", raising=False)
+
+    with TestClient(app) as client:
+        pool = app.state.process_pool
+        # No cache is configured, so both requests really extract
+        assert app.state.extraction_cache is None
+        for run in range(2):
+            response = client.post("/extract-and-validate-pdfs", files=_two_distinct_pdfs())
+
+            assert response.status_code == 200
+            body = response.json()
+            assert body["unique_pdfs"] == 2
+            assert [inv["source_file"] for inv in body["extracted_invoices"]] == ["a.pdf", "b.pdf"]
+            assert app.state.process_pool is pool
+
+
+class _BrokenPool(Executor):
+    """Stand-in for a process pool whose worker has died"""
+
+    def map(self, *args, **kwargs):
+        raise BrokenProcessPool("worker died")
+
+
+def test_broken_process_pool_is_replaced(monkeypatch):
+    """Test that a broken process pool is rebuilt and the upload still succeeds"""
+    monkeypatch.setattr(api_main, "EXTRACT_PROCESSES", 2)
+    monkeypatch.delenv("INVOICE_QC_CACHE_DIR", raising=False)
+
+    with TestClient(app) as client:
+        app.state.process_pool.shutdown()
+        broken = app.state.process_pool = _BrokenPool()
+        response = client.post("/extract-and-validate-pdfs", files=_two_distinct_pdfs())
+        replacement = app.state.process_pool
+
+    assert response.status_code == 200
+    assert len(response.json()["extracted_invoices"]) == 2
+    assert replacement is not broken
+
+
+def test_upload_without_declared_size_is_capped(monkeypatch):
+    """Test that an upload whose size is unknown up front still gets a 413 past the limit"""
+    monkeypatch.setattr(api_main, "MAX_PDF_BYTES", 1024)
+    # Make every upload look like one whose size was never declared
+    init = UploadFile.__init__
+    monkeypatch.setattr(UploadFile, "__init__", lambda self, file, **kw: init(self, file, **{**kw, "size": None}))
+
+    with TestClient(app) as client:
+        response = client.post("/extract-and-validate-pdfs", files=[
+            ("files", ("big.pdf", b"%PDF-1.4 " + b"0" * 4096, "application/pdf")),
+        ])
+
+    assert response.status_code == 413
+
+
+def test_extraction_cache_is_opt_in(tmp_path, monkeypatch):
+    """Test that extractions are only written to disk when a cache directory is set"""
+    monkeypatch.setattr(api_main, "EXTRACT_PROCESSES", 2)
+    monkeypatch.setenv("INVOICE_QC_CACHE_DIR", str(tmp_path))
+
+    with TestClient(app) as client:
+        cache = app.state.extraction_cache
+        assert isinstance(cache, ExtractionCache)
+        first = client.post("/extract-and-validate-pdfs", files=_two_distinct_pdfs())
+        second = client.post("/extract-and-validate-pdfs", files=_two_distinct_pdfs())
+
+    assert first.status_code == second.status_code == 200
+    assert len(list(cache.entry_dir.glob("*/*.json"))) == 2
+    assert second.json()["extracted_invoices"] == first.json()["extracted_invoices"]
+
+
+def test_oversized_upload_waits_for_sibling_saves(monkeypatch):
+    """Test that a 413 is only returned after the other uploads in the batch finished saving"""
+    monkeypatch.setattr(api_main, "MAX_PDF_BYTES", 1024)
+    init = UploadFile.__init__
+    monkeypatch.setattr(UploadFile, "__init__", lambda self, file, **kw: init(self, file, **{**kw, "size": None}))
+    finished = []
+    save = api_main._save_upload
+
+    def slow_save(src, dst_path, filename):
+        if filename != "big.pdf":
+            time.sleep(0.2)
+        try:
+            return save(src, dst_path, filename)
+        finally:
+            finished.append(filename)
+
+    monkeypatch.setattr(api_main, "_save_upload", slow_save)
+
+    with TestClient(app) as client:
+        response = client.post("/extract-and-validate-pdfs", files=[
+            ("files", ("big.pdf", b"%PDF-1.4 " + b"0" * 4096, "application/pdf")),
+            ("files", ("a.pdf", b"%PDF-1.4 small", "application/pdf")),
+            ("files", ("b.pdf", b"%PDF-1.4 small", "application/pdf")),
+        ])
+
+    assert response.status_code == 413
+    assert sorted(finished) == ["a.pdf", "b.pdf", "big.pdf"]
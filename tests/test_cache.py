@@ -0,0 +1,61 @@
+"""
+Unit tests for the extraction cache
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+from invoice_qc.cache import ExtractionCache, HashingWriter
+from invoice_qc.schemas import Invoice
+
+
+def test_cache_round_trip(tmp_path):
+    """Test that a stored invoice is returned for the same digest"""
+    cache = ExtractionCache(tmp_path)
+    invoice = Invoice(
+        invoice_number="INV-001",
+        invoice_date=date(2024, 1, 10),
+        gross_total=Decimal("119.00")
+    )
+
+    sha = "ab" + "0" * 62
+    assert cache.get(sha) is None
+
+    cache.put(sha, invoice.model_dump(mode="json"))
+    assert (cache.entry_dir / "ab" / f"{sha}.json").exists()
+
+    restored = Invoice.model_validate(cache.get(sha))
+    assert restored == invoice
+
+
+def test_hashing_writer_matches_file_hash(tmp_path):
+    """Test that hashing while writing gives the same key as hashing the file"""
+    path = tmp_path / "invoice.pdf"
+    with open(path, "wb") as f:
+        writer = HashingWriter(f)
+        writer.write(b"%PDF-1.4 ")
+        writer.write(b"example")
+
+    assert writer.hexdigest() == ExtractionCache.hash_file(path)
+
+
+def test_concurrent_puts_of_one_digest(tmp_path):
+    """Test that threads storing the same digest do not trip over each other"""
+    cache = ExtractionCache(tmp_path)
+    sha = "cd" + "0" * 62
+    data = Invoice(invoice_number="INV-001").model_dump(mode="json")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: cache.put(sha, data), range(32)))
+
+    assert cache.get(sha) == data
+    assert list((cache.entry_dir / "cd").iterdir()) == [cache.entry_dir / "cd" / f"{sha}.json"]
+
+
+def test_entries_are_scoped_to_extractor_version(tmp_path):
+    """Test that a cache for another extractor version does not see old entries"""
+    sha = "ef" + "0" * 62
+    ExtractionCache(tmp_path, version="old").put(sha, {"invoice_number": "INV-001"})
+
+    assert ExtractionCache(tmp_path, version="old").get(sha) == {"invoice_number": "INV-001"}
+    assert ExtractionCache(tmp_path).get(sha) is None
@@ -0,0 +1,45 @@
+"""
+Unit tests for the command-line interface
+"""
+
+from typer.testing import CliRunner
+from invoice_qc import cli
+from invoice_qc.cli import app
+
+runner = CliRunner()
+
+
+def test_validate_reports_bad_input_with_bracket_text(tmp_path):
+    """Test that error text with [..] in it is printed as-is instead of as markup"""
+    input_file = tmp_path / "invoices.json"
+    input_file.write_text('["[/x]"]')
+
+    result = runner.invoke(app, ["validate", "--input", str(input_file), "--report", str(tmp_path / "report.json")])
+
+    assert result.exit_code == 1
+    assert result.exception is None or isinstance(result.exception, SystemExit)
+    # Rich wraps long lines to the terminal width
+    output = " ".join(result.output.split())
+    assert "is not a valid invoice list" in output
+    assert "input_value='[/x]'" in output
+    assert "input_type=str" in output
+
+
+def test_render_cache_is_opt_in_and_bounded(tmp_path, monkeypatch):
+    """Test that summaries are cached only under --cache-dir and old entries are evicted"""
+    monkeypatch.setattr(cli, "_RENDER_CACHE_MAX_ENTRIES", 2)
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    input_file = tmp_path / "invoices.json"
+    input_file.write_text('[{"invoice_number": "INV-001"}]')
+    cache_dir = tmp_path / "cache"
+
+    runner.invoke(app, ["validate", "--input", str(input_file), "--report", str(tmp_path / "r.json")])
+    assert not cache_dir.exists()
+    assert not (tmp_path / "home").exists()
+
+    for top in (1, 2, 3):
+        runner.invoke(app, [
+            "validate", "--input", str(input_file), "--report", str(tmp_path / "r.json"),
+            "--top", str(top), "--cache-dir", str(cache_dir)
+        ])
+    assert len(list((cache_dir / "render").glob("*.txt"))) == 2
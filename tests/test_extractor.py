@@ -0,0 +1,59 @@
+"""
+Unit tests for invoice extractor
+"""
+
+import shutil
+from pathlib import Path
+from invoice_qc.extractor import InvoiceExtractor
+
+PDF_DIR = Path(__file__).parent.parent / "pdfs"
+
+
+def test_parallel_matches_serial_extraction(tmp_path):
+    """Test that the process-pool extraction returns the same invoices as the serial path"""
+    for pdf in PDF_DIR.glob("*.pdf"):
+        shutil.copy(pdf, tmp_path / pdf.name)
+        shutil.copy(pdf, tmp_path / f"copy-{pdf.name}")
+
+    extractor = InvoiceExtractor()
+    serial = extractor.extract_from_directory(tmp_path)
+    parallel = extractor.extract_from_directory_parallel(tmp_path, workers=2)
+
+    key = lambda invoice: invoice.source_file
+    assert sorted(parallel, key=key) == sorted(serial, key=key)
+    assert len(parallel) == 2 * len(list(PDF_DIR.glob("*.pdf")))
+
+
+def test_field_patterns_keep_priority_order():
+    """Test that an earlier pattern wins even when a later one matches first in the text"""
+    extractor = InvoiceExtractor()
+    text = "Inv. No. A-1\nINVOICE # B-2\n"
+
+    assert extractor._extract_field(text, "invoice_number") == "B-2"
+    assert extractor._extract_field("Inv. No. A-1\n", "invoice_number") == "A-1"
+    assert extractor._extract_field("nothing here", "invoice_number") is None
+
+
+def test_parse_date_formats():
+    """Test day-first precedence, month-first fallback and ISO dates"""
+    extractor = InvoiceExtractor()
+
+    assert extractor._parse_date("03.04.2024") == "2024-04-03"
+    assert extractor._parse_date("04/25/2024") == "2024-04-25"
+    assert extractor._parse_date("2024-04-25") == "2024-04-25"
+    assert extractor._parse_date("04-25-2024") is None
+    assert extractor._parse_date("31/02/24") is None
+
+
+def test_iter_yields_every_invoice(tmp_path):
+    """Test that streaming extraction yields the same invoices as the serial path"""
+    for pdf in PDF_DIR.glob("*.pdf"):
+        for i in range(3):
+            shutil.copy(pdf, tmp_path / f"{i}-{pdf.name}")
+
+    extractor = InvoiceExtractor()
+    serial = extractor.extract_from_directory(tmp_path)
+    streamed = list(extractor.extract_from_directory_iter(tmp_path, workers=2))
+
+    key = lambda invoice: invoice.source_file
+    assert sorted(streamed, key=key) == sorted(serial, key=key)
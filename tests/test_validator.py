@@ -229,5 +229,58 @@ def test_tolerance_matching():
     assert not any(e.rule == "totals_mismatch" for e in result.errors)
 
 
+def test_invoice_date_string_formats():
+    """Test that invoice dates given as strings are parsed in every accepted format"""
+    assert Invoice(invoice_date="2024-03-05").invoice_date == date(2024, 3, 5)
+    assert Invoice(invoice_date="05/03/2024").invoice_date == date(2024, 3, 5)
+    assert Invoice(invoice_date="03/25/2024").invoice_date == date(2024, 3, 25)
+    assert Invoice(invoice_date=" March 5, 2024 ").invoice_date == date(2024, 3, 5)
+    assert Invoice(invoice_date="5 Mar 2024").invoice_date == date(2024, 3, 5)
+
+
+def test_amounts_match_at_tolerance_boundary():
+    """Test that amounts right at the tolerance edge are decided exactly"""
+    validator = InvoiceValidator(tolerance=0.02)
+    
+    # Relative difference of exactly 2% passes, just above it fails
+    assert validator._amounts_match(Decimal("99"), Decimal("101")) is True
+    assert validator._amounts_match(Decimal("99"), Decimal("101.01")) is False
+    assert validator._amounts_match(Decimal("100.00"), Decimal("100.00")) is True
+    
+    # Differences below float precision are still caught with zero tolerance
+    strict = InvoiceValidator(tolerance=0)
+    assert strict._amounts_match(
+        Decimal("123456789012345678901.01"), Decimal("123456789012345678901.02")
+    ) is False
+
+
+def test_standalone_validation_shares_duplicate_state():
+    """Test that validate_invoice calls share the validator's seen set, but batches do not"""
+    validator = InvoiceValidator()
+    
+    invoice = Invoice(
+        invoice_number="INV-001",
+        invoice_date=date(2024, 1, 10),
+        seller_name="ACME Corp",
+        buyer_name="Example Inc",
+        gross_total=Decimal("119.00")
+    )
+    
+    first = validator.validate_invoice(invoice)
+    assert not any(e.rule == "duplicate_invoice" for e in first.errors)
+    second = validator.validate_invoice(invoice)
+    assert any(e.rule == "duplicate_invoice" for e in second.errors)
+    
+    # Clearing the set starts over
+    validator.seen_invoices.clear()
+    assert not any(e.rule == "duplicate_invoice" for e in validator.validate_invoice(invoice).errors)
+    
+    # Batches use their own set: unaffected by earlier calls, and leave none behind
+    report = validator.validate_batch([invoice, invoice])
+    assert not any(e.rule == "duplicate_invoice" for e in report.results[0].errors)
+    assert any(e.rule == "duplicate_invoice" for e in report.results[1].errors)
+    assert len(validator.seen_invoices) == 1
+
+
 if __name__ == "__main__":
-    pytest.main([__file__, "-v"])
\ No newline at end of file
+    pytest.main([__file__, "-v"])